@@ -0,0 +1,27 @@
+import time
+
+from django.core.cache import cache
+
+PRODUCT_REVIEWS_CACHE_TIMEOUT = 300
+PRODUCTS_COUNT_CACHE_KEY = "products:count"
+PRODUCTS_COUNT_CACHE_TIMEOUT = 60
+
+
+def _reviews_version_key(product_id):
+    return f"prod:{product_id}:rev:version"
+
+
+def product_reviews_cache_key(product_id, page_number, page_size):
+    """Cache key of one page of a product's reviews."""
+    # A missing (evicted) version gets a fresh value, so old pages are never hit.
+    version = cache.get_or_set(_reviews_version_key(product_id), time.time_ns, None)
+    return f"prod:{product_id}:rev:{version}:p{page_number}:s{page_size}"
+
+
+def invalidate_product_reviews(*product_ids):
+    version = time.time_ns()
+    cache.set_many({_reviews_version_key(pk): version for pk in product_ids}, None)
+
+
+def invalidate_products_count():
+    cache.delete(PRODUCTS_COUNT_CACHE_KEY)
@@ -0,0 +1,36 @@
+import django_filters
+from rest_framework import filters
+
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """Exact-match filters on name and price; price is matched on price_cents."""
+
+    price = django_filters.NumberFilter(method="filter_price")
+
+    class Meta:
+        model = Product
+        fields = ["name", "price"]
+
+    def filter_price(self, queryset, name, value):
+        cents = value * 100
+        if cents != cents.to_integral_value():
+            return queryset.none()
+        return queryset.filter(price_cents=int(cents))
+
+
+class AliasOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that maps public field names through ``view.ordering_aliases``."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        aliases = getattr(view, "ordering_aliases", {})
+        if not ordering or not aliases:
+            return ordering
+        mapped = []
+        for field in ordering:
+            prefix = "-" if field.startswith("-") else ""
+            name = field.lstrip("-")
+            mapped.append(prefix + aliases.get(name, name))
+        return mapped
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-15 04:29
+
+from django.db import migrations, models
+from django.db.models import Avg, Count
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    stats = (
+        Review.objects.order_by()
+        .values('product_id')
+        .annotate(avg=Avg('rating'), count=Count('id'))
+    )
+    for row in stats:
+        Product.objects.filter(pk=row['product_id']).update(
+            avg_rating=row['avg'], reviews_count=row['count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_product_options_review'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='avg_rating',
+            field=models.FloatField(db_index=True, default=0.0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-15 04:33
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_listing_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.PositiveSmallIntegerField(help_text='Rating must be between 1 and 5 (or other defined range).', validators=[django.core.validators.MinValueValidator(1, message='La note doit être entre 1 et 5.'), django.core.validators.MaxValueValidator(5, message='La note doit être entre 1 et 5.')]),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='rating_1_5'),
+        ),
+    ]
@@ -1,15 +1,35 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+RATING_ERROR = "La note doit être entre 1 et 5."
 
 
 class Product(models.Model):
     name = models.CharField(max_length=120)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Integer mirror of price computed by the database; used for serialization,
+    # filtering and ordering
+    price_cents = models.GeneratedField(
+        expression=Cast(Round(F("price") * 100), models.BigIntegerField()),
+        output_field=models.BigIntegerField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized from Review, kept in sync by products.signals
+    avg_rating = models.FloatField(default=0.0, db_index=True)
+    reviews_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
+        indexes = [
+            models.Index(fields=["-created_at"]),
+            models.Index(fields=["name"]),
+            models.Index(fields=["price_cents"]),
+        ]
 
     def __str__(self):
         return self.name
@@ -23,7 +43,11 @@ class Review(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reviews"
     )
     rating = models.PositiveSmallIntegerField(
-        help_text="Rating must be between 1 and 5 (or other defined range)."
+        help_text="Rating must be between 1 and 5 (or other defined range).",
+        validators=[
+            MinValueValidator(1, message=RATING_ERROR),
+            MaxValueValidator(5, message=RATING_ERROR),
+        ],
     )
     comment = models.CharField(max_length=500, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -33,6 +57,20 @@ class Review(models.Model):
         verbose_name_plural = "Reviews"
         unique_together = ("product", "user")
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["product", "-created_at"])]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(rating__gte=1) & models.Q(rating__lte=5),
+                name="rating_1_5",
+            )
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets products.signals refresh the old product when a review moves
+        instance._loaded_product_id = instance.__dict__.get("product_id")
+        return instance
 
     def __str__(self):
         return f"Review for {self.product.name} by {self.user} - {self.rating}/5"
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+from .caching import PRODUCTS_COUNT_CACHE_KEY, PRODUCTS_COUNT_CACHE_TIMEOUT
+
+
+class CachedCountPaginator(Paginator):
+    """Serves the count of an unfiltered queryset from ``cache_key`` instead of COUNT(*)."""
+
+    def __init__(self, object_list, per_page, *, cache_key, cache_timeout, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.cache_timeout = cache_timeout
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where:
+            return cache.get_or_set(self.cache_key, qs.count, self.cache_timeout)
+        return super().count
+
+
+class ProductPagination(PageNumberPagination):
+    count_cache_key = PRODUCTS_COUNT_CACHE_KEY
+    count_cache_timeout = PRODUCTS_COUNT_CACHE_TIMEOUT
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(
+            object_list,
+            per_page,
+            cache_key=self.count_cache_key,
+            cache_timeout=self.count_cache_timeout,
+        )
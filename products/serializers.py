@@ -1,5 +1,21 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import Product, Review
+from .models import RATING_ERROR, Product, Review
+
+
+class CentsPriceField(serializers.DecimalField):
+    """Decimal input, rendered from ``Product.price_cents`` without building a Decimal."""
+
+    def get_attribute(self, instance):
+        # price_cents is computed by the database, so it is stale on an instance
+        # that was just saved; reads defer price and use the integer column.
+        if "price" in instance.get_deferred_fields():
+            return instance.price_cents
+        return int((Decimal(str(instance.price)) * 100).to_integral_value())
+
+    def to_representation(self, value):
+        return "%d.%02d" % divmod(value, 100)
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -8,12 +24,16 @@ class ProductSerializer(serializers.ModelSerializer):
     - name: nom commercial (commercial name)
     - price: prix TTC en euros (price including tax, must be > 0)
     - created_at: horodatage de création (creation timestamp, read-only)
+    - avg_rating: note moyenne des avis (average review rating, read-only)
+    - reviews_count: nombre d'avis (number of reviews, read-only)
     """
 
+    price = CentsPriceField(max_digits=10, decimal_places=2)
+
     class Meta:
         model = Product
-        fields = "__all__"
-        read_only_fields = ("created_at",)
+        fields = ("id", "name", "price", "created_at", "avg_rating", "reviews_count")
+        read_only_fields = ("created_at", "avg_rating", "reviews_count")
 
     def validate_price(self, value):
         """Ensures the price is positive."""
@@ -25,27 +45,42 @@ class ProductSerializer(serializers.ModelSerializer):
 class ReviewSerializer(serializers.ModelSerializer):
     """Serializer for the Review model."""
 
-    user = serializers.StringRelatedField(read_only=True)
+    user = serializers.CharField(source="user.username", read_only=True)
 
     class Meta:
         model = Review
-        fields = "__all__"
+        fields = ("id", "product", "user", "rating", "comment", "created_at")
         read_only_fields = ("user", "created_at")
-
-    def validate_rating(self, value):
-        if value < 1 or value > 5:
-            raise serializers.ValidationError("La note doit être entre 1 et 5.")
-        return value
+        extra_kwargs = {
+            "rating": {
+                "error_messages": {"min_value": RATING_ERROR, "max_value": RATING_ERROR}
+            }
+        }
 
     def validate(self, attrs):
-        request = self.context.get("request")
-        if request and request.method == "POST":
-            product = attrs.get("product")
-            if (
-                product
-                and Review.objects.filter(product=product, user=request.user).exists()
-            ):
-                raise serializers.ValidationError(
-                    "Vous avez déjà laissé un avis pour ce produit."
-                )
+        """
+        Rejects a duplicate new review when the caller already knows which products
+        the user reviewed. Bulk endpoints should pass
+        ``user_reviewed_product_ids`` in the serializer context, e.g.
+        ``set(Review.objects.filter(user=request.user).values_list("product_id", flat=True))``,
+        so that validating N reviews costs one query. Without it, duplicates are
+        caught by the (product, user) unique constraint on save.
+        """
+        if self.instance is not None:
+            return attrs
+        reviewed = self.context.get("user_reviewed_product_ids")
+        product = attrs.get("product")
+        if reviewed is not None and product is not None and product.pk in reviewed:
+            raise serializers.ValidationError(
+                "Vous avez déjà laissé un avis pour ce produit."
+            )
         return attrs
+
+
+class ProductWithReviewsSerializer(ProductSerializer):
+    """Product with its most recent reviews (``?expand=reviews`` on the list)."""
+
+    recent_reviews = ReviewSerializer(many=True, read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ("recent_reviews",)
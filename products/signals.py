@@ -0,0 +1,83 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Avg, Count, FloatField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_product_reviews, invalidate_products_count
+from .models import Product, Review
+
+
+def refresh_product_ratings(product_ids):
+    """Recompute Product.avg_rating / reviews_count in a single UPDATE."""
+    reviews = (
+        Review.objects.filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+    )
+    Product.objects.filter(pk__in=product_ids).update(
+        avg_rating=Coalesce(
+            Subquery(reviews.annotate(a=Avg("rating")).values("a")),
+            0.0,
+            output_field=FloatField(),
+        ),
+        reviews_count=Coalesce(
+            Subquery(reviews.annotate(c=Count("id")).values("c")), 0
+        ),
+    )
+
+
+# Products touched by the current thread's writes, refreshed when they commit.
+_pending = threading.local()
+
+
+def _flush_pending_refresh():
+    product_ids = getattr(_pending, "product_ids", None)
+    _pending.product_ids = set()
+    if product_ids:
+        refresh_product_ratings(product_ids)
+        invalidate_product_reviews(*product_ids)
+
+
+def schedule_product_refresh(*product_ids):
+    if not hasattr(_pending, "product_ids"):
+        _pending.product_ids = set()
+    _pending.product_ids.update(product_ids)
+    # One callback per write stays correct on rollback; the first one to run
+    # refreshes every pending product and the others find nothing left to do.
+    transaction.on_commit(_flush_pending_refresh)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    # A review moved to another product must also refresh the old one.
+    previous = getattr(instance, "_loaded_product_id", None)
+    if previous and previous != instance.product_id:
+        schedule_product_refresh(instance.product_id, previous)
+    else:
+        schedule_product_refresh(instance.product_id)
+    instance._loaded_product_id = instance.product_id
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    # Reviews cascade-deleted with their product: nothing left to refresh.
+    if isinstance(origin, Product) or (
+        isinstance(origin, QuerySet) and origin.model is Product
+    ):
+        return
+    schedule_product_refresh(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    # After commit, so a concurrent list can't re-cache the old count
+    if created:
+        transaction.on_commit(invalidate_products_count)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_products_count)
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.test import override_settings
+from products.models import Product, Review
+from products.signals import refresh_product_ratings
+
+User = get_user_model()
+
+PRODUCTS = 50
+REVIEWS_PER_PRODUCT = 20
+
+
+class QueryCountTests(APITestCase):
+    """Pins the number of SQL queries per endpoint so N+1 regressions fail CI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(username=f"user{i}") for i in range(REVIEWS_PER_PRODUCT)
+        )
+        products = Product.objects.bulk_create(
+            Product(name=f"Produit {i}", price="9.99")
+            for i in range(PRODUCTS)
+        )
+        Review.objects.bulk_create(
+            Review(product=product, user=user, rating=4, comment="Bien")
+            for product in products
+            for user in users
+        )
+        # bulk_create skips the Review signals that maintain these columns
+        refresh_product_ratings([product.pk for product in products])
+        cls.product = products[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_products(self):
+        # COUNT + page
+        with self.assertNumQueries(2):
+            res = self.client.get("/api/products/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # the unfiltered count is now cached
+        with self.assertNumQueries(1):
+            self.client.get("/api/products/")
+
+    def test_list_products_expand_reviews(self):
+        # COUNT + page + one prefetch for every product of the page
+        with self.assertNumQueries(3):
+            res = self.client.get("/api/products/?expand=reviews")
+        self.assertEqual(len(res.data["results"][0]["recent_reviews"]), 5)
+
+    def test_product_reviews(self):
+        url = f"/api/products/{self.product.id}/reviews/"
+        # product + COUNT + page (reviews joined with users)
+        with self.assertNumQueries(3):
+            res = self.client.get(url)
+        self.assertEqual(res.data["count"], REVIEWS_PER_PRODUCT)
+        # product only, the page comes from the cache
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_list_reviews(self):
+        # COUNT + page (reviews joined with users)
+        with self.assertNumQueries(2):
+            res = self.client.get("/api/reviews/")
+        self.assertEqual(res.data["count"], PRODUCTS * REVIEWS_PER_PRODUCT)
+
+    def test_product_rating(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(f"/api/products/{self.product.id}/rating/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.json(),
+            {
+                "product_id": self.product.id,
+                "avg_rating": 4.0,
+                "count": REVIEWS_PER_PRODUCT,
+            },
+        )
+
+
+@override_settings(DEBUG=True)
+class QueryCountMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        Product.objects.create(name="Stylo", price="2.50")
+
+    def test_logs_query_count(self):
+        with self.assertLogs("products.middleware", "DEBUG") as logs:
+            self.client.get("/api/products/")
+        # COUNT + page
+        self.assertEqual(
+            logs.output, ["DEBUG:products.middleware:GET /api/products/: 2 SQL queries"]
+        )
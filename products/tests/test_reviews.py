@@ -1,13 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from products.models import Product, Review
+from products.serializers import ReviewSerializer
 
 User = get_user_model()
 
 
 class ReviewTests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username="alice", password="pw")
         self.product = Product.objects.create(name="Stylo", price="2.50")
         self.client.force_authenticate(user=self.user)
@@ -23,15 +28,154 @@ class ReviewTests(APITestCase):
             "/api/reviews/", {"product": self.product.id, "rating": 4}, format="json"
         )
         self.assertEqual(res2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res2.json(),
+            {"non_field_errors": ["Vous avez déjà laissé un avis pour ce produit."]},
+        )
 
     def test_product_rating_endpoint(self):
-        Review.objects.create(product=self.product, user=self.user, rating=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=4)
         res = self.client.get(f"/api/products/{self.product.id}/rating/")
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn("avg_rating", res.data)
+        self.assertEqual(
+            res.json(), {"product_id": self.product.id, "avg_rating": 4.0, "count": 1}
+        )
 
     def test_filter_products_by_min_rating(self):
-        Review.objects.create(product=self.product, user=self.user, rating=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=5)
         res = self.client.get("/api/products/?min_rating=4")
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertTrue(any(p["id"] == self.product.id for p in res.data["results"]))
+
+    def test_min_rating_filter_does_not_aggregate_reviews(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=2)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get("/api/products/?min_rating=4")
+        self.assertEqual(res.data["count"], 0)
+        for query in ctx.captured_queries:
+            self.assertNotIn("products_review", query["sql"])
+
+    def test_product_reviews_endpoint_is_paginated(self):
+        Review.objects.create(product=self.product, user=self.user, rating=3)
+        res = self.client.get(f"/api/products/{self.product.id}/reviews/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 1)
+        self.assertEqual(res.data["results"][0]["user"], "alice")
+
+    def test_product_rating_columns_follow_reviews(self):
+        other = User.objects.create_user(username="bob", password="pw")
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                Review.objects.create(product=self.product, user=self.user, rating=5)
+                review = Review.objects.create(product=self.product, user=other, rating=2)
+        # both writes are folded into a single refresh
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reviews_count, 2)
+        self.assertAlmostEqual(self.product.avg_rating, 3.5)
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reviews_count, 1)
+        self.assertAlmostEqual(self.product.avg_rating, 5.0)
+
+    def test_moving_review_refreshes_both_products(self):
+        other = Product.objects.create(name="Gomme", price="1.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=4)
+        review = Review.objects.get(product=self.product)
+        review.product = other
+        with self.captureOnCommitCallbacks(execute=True):
+            review.save()
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.product.reviews_count, 0)
+        self.assertEqual(other.reviews_count, 1)
+
+    def test_rating_refresh_survives_rolled_back_write(self):
+        try:
+            with transaction.atomic():
+                Review.objects.create(product=self.product, user=self.user, rating=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reviews_count, 1)
+        self.assertAlmostEqual(self.product.avg_rating, 4.0)
+
+    def test_deleting_product_skips_rating_refresh(self):
+        users = User.objects.bulk_create(User(username=f"u{i}") for i in range(10))
+        Review.objects.bulk_create(
+            Review(product=self.product, user=user, rating=3) for user in users
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.product.delete()
+        self.assertFalse(any("UPDATE" in q["sql"] for q in ctx.captured_queries))
+
+    def test_product_reviews_cache_invalidated_on_write(self):
+        url = f"/api/products/{self.product.id}/reviews/"
+        self.assertEqual(self.client.get(url).data["count"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.product, user=self.user, rating=4)
+        self.assertEqual(self.client.get(url).data["count"], 1)
+
+    def test_update_own_review(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=2)
+        res = self.client.patch(f"/api/reviews/{review.id}/", {"rating": 4}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK, res.content)
+        self.assertEqual(res.data["user"], "alice")
+        self.assertEqual(res.data["product"], self.product.id)
+        review.refresh_from_db()
+        self.assertEqual(review.rating, 4)
+
+    def test_product_rating_unknown_product(self):
+        res = self.client.get("/api/products/999999/rating/")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serializer_uses_reviewed_products_from_context(self):
+        ser = ReviewSerializer(
+            data={"product": self.product.id, "rating": 4},
+            context={"user_reviewed_product_ids": {self.product.id}},
+        )
+        self.assertFalse(ser.is_valid())
+        self.assertIn("non_field_errors", ser.errors)
+
+    def test_rating_out_of_range_rejected(self):
+        res = self.client.post(
+            "/api/reviews/", {"product": self.product.id, "rating": 6}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["rating"], ["La note doit être entre 1 et 5."])
+
+    def test_product_reviews_cache_ignores_unrelated_params(self):
+        users = User.objects.bulk_create(User(username=f"u{i}") for i in range(11))
+        Review.objects.bulk_create(
+            Review(product=self.product, user=user, rating=4) for user in users
+        )
+        url = f"/api/products/{self.product.id}/reviews/"
+        self.client.get(url + "?junk=1")
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url + "?junk=2")
+        # only the product lookup: the page came from the cache
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(res.data["count"], 11)
+        self.assertEqual(len(res.data["results"]), 10)
+        # links are built from the current request, not the cached one
+        self.assertIn("junk=2", res.data["next"])
+
+    def test_serializer_context_does_not_block_updates(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=2)
+        ser = ReviewSerializer(
+            review,
+            data={"product": self.product.id, "rating": 5},
+            partial=True,
+            context={"user_reviewed_product_ids": {self.product.id}},
+        )
+        self.assertTrue(ser.is_valid(), ser.errors)
@@ -1,6 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from drf_spectacular.generators import SchemaGenerator
 from rest_framework.test import APITestCase
 from rest_framework import status
+from products.models import Product, Review
+from products.serializers import ProductSerializer
 
 
 User = get_user_model()
@@ -46,3 +53,104 @@ class ProductXMLJSONTests(APITestCase):
         res = self.client.get("/api/products/", HTTP_ACCEPT="application/xml")
         self.assertEqual(res.status_code, status.HTTP_200_OK, res.content)
         self.assertIn(b"<?xml", res.content[:20])
+
+
+class ProductTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="pw")
+        self.product = Product.objects.create(name="Stylo", price="2.50")
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_products_expand_reviews(self):
+        Review.objects.create(product=self.product, user=self.user, rating=5)
+        res = self.client.get("/api/products/?expand=reviews")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        product = next(p for p in res.data["results"] if p["id"] == self.product.id)
+        self.assertEqual(len(product["recent_reviews"]), 1)
+        self.assertEqual(product["recent_reviews"][0]["user"], "alice")
+        res = self.client.get("/api/products/")
+        self.assertNotIn("recent_reviews", res.data["results"][0])
+
+    def test_product_list_count_is_cached(self):
+        self.assertEqual(self.client.get("/api/products/").data["count"], 1)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get("/api/products/")
+        self.assertEqual(res.data["count"], 1)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.create(name="Gomme", price="1.00")
+        # still cached until the transaction commits
+        self.assertEqual(self.client.get("/api/products/").data["count"], 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get("/api/products/").data["count"], 2)
+
+    def test_product_price_rendered_from_cents(self):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price_cents, 250)
+        res = self.client.get(f"/api/products/{self.product.id}/")
+        self.assertEqual(res.data["price"], "2.50")
+        res = self.client.patch(
+            f"/api/products/{self.product.id}/", {"price": "3.05"}, format="json"
+        )
+        self.assertEqual(res.data["price"], "3.05")
+
+    def test_serialize_freshly_created_product(self):
+        # price is still the string passed to create()
+        product = Product.objects.create(name="Gomme", price="2.50")
+        self.assertEqual(ProductSerializer(product).data["price"], "2.50")
+
+    def test_max_price_fits_price_cents(self):
+        product = Product.objects.create(name="Yacht", price="99999999.99")
+        res = self.client.get(f"/api/products/{product.id}/")
+        self.assertEqual(res.data["price"], "99999999.99")
+
+    def test_price_cents_follows_queryset_writes(self):
+        Product.objects.bulk_create([Product(name="Gomme", price="5.00")])
+        Product.objects.filter(pk=self.product.pk).update(price="7.00")
+        res = self.client.get("/api/products/?ordering=price")
+        self.assertEqual([p["price"] for p in res.data["results"]], ["5.00", "7.00"])
+
+    def test_filter_products_by_price(self):
+        Product.objects.create(name="Gomme", price="1.00")
+        res = self.client.get("/api/products/?price=2.5")
+        self.assertEqual([p["id"] for p in res.data["results"]], [self.product.id])
+        res = self.client.get("/api/products/?price=2.505")
+        self.assertEqual(res.data["count"], 0)
+
+    def test_product_rating_is_json_only(self):
+        res = self.client.get(
+            f"/api/products/{self.product.id}/rating/", HTTP_ACCEPT="application/xml"
+        )
+        self.assertEqual(res.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_product_rating_out_of_range_id(self):
+        for pk in ("99999999999999999999", "0", "-1"):
+            res = self.client.get(f"/api/products/{pk}/rating/")
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, pk)
+
+
+@override_settings(PRODUCTS_XML_ENABLED=False)
+class ProductJSONOnlyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="a", password="a")
+        self.client.force_authenticate(user=self.user)
+
+    def test_xml_request_rejected(self):
+        res = self.client.post(
+            "/api/products/",
+            data="<root><name>Notebook</name><price>3.50</price></root>",
+            content_type="application/xml",
+            HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_xml_response_not_acceptable(self):
+        res = self.client.get("/api/products/", HTTP_ACCEPT="application/xml")
+        self.assertEqual(res.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_schema_only_lists_json(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        operation = schema["paths"]["/api/products/"]["post"]
+        self.assertEqual(list(operation["requestBody"]["content"]), ["application/json"])
@@ -1,11 +1,21 @@
-from rest_framework import viewsets, permissions, filters, response, decorators, status
+from rest_framework import (
+    viewsets,
+    permissions,
+    response,
+    decorators,
+    serializers,
+    status,
+)
 from rest_framework.parsers import JSONParser
 from rest_framework.renderers import JSONRenderer
-from rest_framework_xml.parsers import XMLParser
-from rest_framework_xml.renderers import XMLRenderer
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count, FloatField
-from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.http import Http404, JsonResponse
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch
 
 
 from drf_spectacular.utils import (
@@ -16,11 +26,30 @@ from drf_spectacular.utils import (
     OpenApiResponse,
 )
 
+from .caching import PRODUCT_REVIEWS_CACHE_TIMEOUT, product_reviews_cache_key
+from .filters import AliasOrderingFilter, ProductFilter
 from .models import Product, Review
-from .serializers import ProductSerializer, ReviewSerializer
+from .pagination import ProductPagination
+from .serializers import (
+    ProductSerializer,
+    ProductWithReviewsSerializer,
+    ReviewSerializer,
+)
 from .permissions import IsOwnerOrReadOnly
 
 
+def _xml_enabled():
+    # Read per request so the flag can be changed with override_settings
+    return getattr(settings, "PRODUCTS_XML_ENABLED", True)
+
+
+# Number of reviews embedded per product with ?expand=reviews
+RECENT_REVIEWS_LIMIT = 5
+
+# Largest value of the BigAutoField primary key
+MAX_PRODUCT_ID = 2**63 - 1
+
+
 @extend_schema_view(
     list=extend_schema(
         tags=["Products"],
@@ -58,6 +87,13 @@ from .permissions import IsOwnerOrReadOnly
                 type=float,
                 location=OpenApiParameter.QUERY,
             ),
+            OpenApiParameter(
+                name="expand",
+                description="expand=reviews inclut les derniers avis de chaque produit",
+                required=False,
+                type=str,
+                location=OpenApiParameter.QUERY,
+            ),
         ],
     ),
     retrieve=extend_schema(
@@ -68,10 +104,8 @@ from .permissions import IsOwnerOrReadOnly
     create=extend_schema(
         tags=["Products"],
         summary="Créer un produit",
-        request={
-            "application/json": ProductSerializer,
-            "application/xml": ProductSerializer,
-        },
+        # Media types follow get_parsers(), i.e. PRODUCTS_XML_ENABLED
+        request=ProductSerializer,
         responses={201: OpenApiResponse(response=ProductSerializer)},
         examples=[
             OpenApiExample(
@@ -96,19 +130,15 @@ from .permissions import IsOwnerOrReadOnly
     update=extend_schema(
         tags=["Products"],
         summary="Mettre à jour un produit",
-        request={
-            "application/json": ProductSerializer,
-            "application/xml": ProductSerializer,
-        },
+        # Media types follow get_parsers(), i.e. PRODUCTS_XML_ENABLED
+        request=ProductSerializer,
         responses={200: OpenApiResponse(response=ProductSerializer)},
     ),
     partial_update=extend_schema(
         tags=["Products"],
         summary="Modifier partiellement un produit",
-        request={
-            "application/json": ProductSerializer,
-            "application/xml": ProductSerializer,
-        },
+        # Media types follow get_parsers(), i.e. PRODUCTS_XML_ENABLED
+        request=ProductSerializer,
         responses={200: OpenApiResponse(response=ProductSerializer)},
     ),
     destroy=extend_schema(
@@ -121,23 +151,62 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by("-created_at")
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ProductPagination
 
-    # Accept JSON & XML; render JSON & XML
-    parser_classes = [JSONParser, XMLParser]
-    renderer_classes = [JSONRenderer, XMLRenderer]
+    # Accept & render JSON, plus XML when PRODUCTS_XML_ENABLED (see get_parsers)
+    parser_classes = [JSONParser]
+    renderer_classes = [JSONRenderer]
 
     # Filtering / ordering
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, AliasOrderingFilter]
     ordering_fields = ["created_at", "price", "name"]
+    # Prices are filtered and sorted on the integer column
+    ordering_aliases = {"price": "price_cents"}
     ordering = ["-created_at"]
-    filterset_fields = ["name", "price"]
+    filterset_class = ProductFilter
+
+    def get_parsers(self):
+        parsers = super().get_parsers()
+        if _xml_enabled():
+            # Imported lazily: JSON-only setups never load rest_framework_xml
+            from rest_framework_xml.parsers import XMLParser
+
+            parsers.append(XMLParser())
+        return parsers
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        # Actions declaring their own renderer_classes (e.g. rating) opt out
+        if _xml_enabled() and self.renderer_classes is type(self).renderer_classes:
+            from rest_framework_xml.renderers import XMLRenderer
+
+            renderers.append(XMLRenderer())
+        return renderers
+
+    def _expand_reviews(self):
+        expand = self.request.query_params.get("expand", "")
+        return self.action == "list" and "reviews" in expand.split(",")
+
+    def get_serializer_class(self):
+        if self._expand_reviews():
+            return ProductWithReviewsSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         qs = super().get_queryset()
-        qs = qs.annotate(
-            avg_rating=Coalesce(Avg("reviews__rating"), 0.0, output_field=FloatField()),
-            reviews_count=Count("reviews"),
-        )
+        if self.action in ("list", "retrieve"):
+            # Prices are rendered from price_cents; skip the NUMERIC column.
+            qs = qs.defer("price")
+        if self._expand_reviews():
+            # One extra IN query for the whole page instead of one per product
+            recent = Review.objects.select_related("user").order_by("-created_at")
+            qs = qs.prefetch_related(
+                Prefetch(
+                    "reviews",
+                    queryset=recent[:RECENT_REVIEWS_LIMIT],
+                    to_attr="recent_reviews",
+                )
+            )
         min_rating = self.request.query_params.get("min_rating")
         if min_rating:
             try:
@@ -146,7 +215,9 @@ class ProductViewSet(viewsets.ModelViewSet):
                 pass
         return qs
 
-    @decorators.action(detail=True, methods=["get"], url_path="rating")
+    @decorators.action(
+        detail=True, methods=["get"], url_path="rating", renderer_classes=[JSONRenderer]
+    )
     @extend_schema(
         tags=["Products"],
         summary="Obtenir la note moyenne d'un produit",
@@ -171,21 +242,28 @@ class ProductViewSet(viewsets.ModelViewSet):
         },
     )
     def rating(self, request, pk=None):
-        product = self.get_object()
-        data = {
-            "product_id": product.id,
-            "avg_rating": getattr(product, "avg_rating", None),
-            "count": getattr(product, "reviews_count", None),
-        }
-        if data["avg_rating"] is None:
-            agg = product.reviews.aggregate(
-                avg_rating=Coalesce(Avg("rating"), 0.0, output_field=FloatField()),
-                reviews_count=Count("id"),
+        # Single primary-key lookup of the denormalized rating columns.
+        try:
+            product_id = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        # Out-of-range ids can't exist and would overflow the DB integer type
+        if not 0 < product_id <= MAX_PRODUCT_ID:
+            raise Http404
+        table = connection.ops.quote_name(Product._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT avg_rating, reviews_count FROM {table} WHERE id = %s",
+                [product_id],
             )
-            data["avg_rating"] = agg["avg_rating"]
-            data["count"] = agg["reviews_count"]
-
-        return response.Response(data)
+            row = cursor.fetchone()
+        if row is None:
+            raise Http404
+        # JSON is the only renderer negotiated for this action; return the
+        # payload directly instead of going through Response rendering.
+        return JsonResponse(
+            {"product_id": product_id, "avg_rating": row[0], "count": row[1]}
+        )
 
     @decorators.action(detail=True, methods=["get"], url_path="reviews")
     @extend_schema(
@@ -195,9 +273,40 @@ class ProductViewSet(viewsets.ModelViewSet):
     )
     def product_reviews(self, request, pk=None):
         product = self.get_object()
-        qs = product.reviews.all().order_by("-created_at")
-        ser = ReviewSerializer(qs, many=True)
-        return response.Response(ser.data)
+        qs = product.reviews.select_related("user").order_by("-created_at")
+        paginator = self.paginator
+        if paginator is None:
+            return response.Response(ReviewSerializer(qs, many=True).data)
+
+        # Key on the pagination parameters only, so unrelated query strings
+        # can't multiply cache entries.
+        page_number = request.query_params.get(paginator.page_query_param, "1")
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            pass
+        key = product_reviews_cache_key(
+            product.pk, page_number, paginator.get_page_size(request)
+        )
+        cached = cache.get(key)
+        if cached is None:
+            page = self.paginate_queryset(qs)
+            cached = {
+                "count": paginator.page.paginator.count,
+                "number": paginator.page.number,
+                "results": ReviewSerializer(page, many=True).data,
+            }
+            cache.set(key, cached, PRODUCT_REVIEWS_CACHE_TIMEOUT)
+        else:
+            # Rebuild the page without hitting the DB; next/previous links
+            # are then derived from this request, not the cached one.
+            django_paginator = paginator.django_paginator_class(
+                [], paginator.get_page_size(request)
+            )
+            django_paginator.count = cached["count"]
+            paginator.request = request
+            paginator.page = Page(cached["results"], cached["number"], django_paginator)
+        return self.get_paginated_response(cached["results"])
 
 
 @extend_schema_view(
@@ -213,9 +322,24 @@ class ProductViewSet(viewsets.ModelViewSet):
     ),
 )
 class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.select_related("product", "user").all()
+    # The serializer only needs the product FK and the author's username.
+    queryset = Review.objects.select_related("user").only(
+        "id", "product_id", "user__username", "rating", "comment", "created_at"
+    )
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # The (product, user) unique constraint enforces one review per user;
+        # catching the violation avoids a SELECT before every insert.
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        "Vous avez déjà laissé un avis pour ce produit."
+                    ]
+                }
+            )